@@ -0,0 +1,58 @@
+# Per-frame movement kernels for smart-simulation.py
+# The direction tables are passed in so this module has no pygame or simulation state of its own.
+
+import numpy as np
+try:
+    from numba import njit
+except ImportError: # numba is optional, the kernels then run as plain Python
+    def njit(*args, **kwargs):
+        return lambda f: f
+
+@njit(cache=True)
+def span(direction, x, y, w, h, dirSign, dirHorizontal):
+    # Signed rear and front of one box along a direction of travel, scalar version of alongAxis
+    if dirHorizontal[direction]:
+        start, length = x, w
+    else:
+        start, length = y, h
+    if dirSign[direction] > 0:
+        return start, start + length
+    return -(start + length), -start
+
+@njit(cache=True)
+def frameSteps(live, x, y, w, h, d, lane, speed, stop, leader, crossLeader, willTurn, crossed, turned, green,
+               dirSign, dirHorizontal, turnAt, exitDirection, movingGap):
+    """Step of each live vehicle this frame from start-of-frame positions, and which vehicles are mid-turn."""
+    n = x.shape[0]
+    dx = np.zeros(n)
+    dy = np.zeros(n)
+    turning = np.zeros(n, np.bool_)
+    for k in range(live.shape[0]):
+        i = live[k]
+        di, li = d[i], lane[i]
+        front = span(di, x[i], y[i], w[i], h[i], dirSign, dirHorizontal)[1]
+        # Turning vehicles keep driving straight until their turn point
+        approach = not crossed[i] or (willTurn[i] and front < turnAt[di, li])
+        if not approach and willTurn[i] and not turned[i]:
+            turning[i] = True
+            continue
+        heading = exitDirection[di, li] if not approach and turned[i] else di
+
+        # Gap to the leader: the spawn lane leader while approaching, the crossing queue leader after
+        L = leader[i] if approach else crossLeader[i]
+        gapOk = True
+        if L >= 0:
+            headFront = span(heading, x[i], y[i], w[i], h[i], dirSign, dirHorizontal)[1]
+            leaderRear = span(heading, x[L], y[L], w[L], h[L], dirSign, dirHorizontal)[0]
+            gapOk = headFront < leaderRear - movingGap
+            # A turning vehicle doesn't wait behind a leader that is itself turning off
+            if approach and willTurn[i] and (turned[L] or (crossed[L] and willTurn[L])):
+                gapOk = True
+
+        canGo = not approach or front <= stop[i] or green[di] or (willTurn[i] and crossed[i])
+        if gapOk and canGo:
+            if dirHorizontal[heading]:
+                dx[i] = speed[i] * dirSign[heading]
+            else:
+                dy[i] = speed[i] * dirSign[heading]
+    return dx, dy, turning
@@ -10,7 +10,7 @@ Usage:
 
 The script will:
 1. Connect to vehicle_detection.db
-2. Get the latest vehicle counts
+2. Get the average and latest vehicle counts in a single query
 3. Write to traffic_data.txt in the required format
 """
 
@@ -25,84 +25,70 @@ DB_PATH = os.path.join(PROJECT_ROOT, "data", "vehicle_detection.db")
 OUTPUT_PATH = os.path.join(SCRIPT_DIR, "traffic_data.txt")
 
 
-def get_latest_counts_from_db():
-    """Read the latest vehicle counts from the SQLite database."""
+def get_counts_from_db():
+    """
+    Read the average and the latest vehicle counts from the SQLite database.
+
+    Both come back from one connection and one query. Returns (stats, latest);
+    either is None when the database is missing or holds no records.
+    """
     if not os.path.exists(DB_PATH):
         print(f"[ERROR] Database not found: {DB_PATH}")
         print("   Run PassedCounting.py first to generate detection data.")
-        return None
+        return None, None
     
     try:
         conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Get the latest record
-        cursor.execute("""
-            SELECT cars, vans, motors, buses, bicycles, datetime_str
-            FROM vehicle_counts
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """)
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'cars': row[0],
-                'vans': row[1],      # trucks in simulation
-                'motors': row[2],    # motorcycles/bikes in simulation
-                'buses': row[3],     # tuk-tuks in simulation
-                'bicycles': row[4],
-                'timestamp': row[5]
-            }
-        else:
-            print("[ERROR] No data found in database.")
-            return None
+        try:
+            # Averages are more representative than a single record; the latest
+            # record uses the idx_timestamp index created by the detection side
+            row = conn.execute("""
+                WITH stats AS (
+                    SELECT
+                        ROUND(AVG(cars)) AS avg_cars,
+                        ROUND(AVG(vans)) AS avg_vans,
+                        ROUND(AVG(motors)) AS avg_motors,
+                        ROUND(AVG(buses)) AS avg_buses,
+                        ROUND(AVG(bicycles)) AS avg_bicycles,
+                        COUNT(*) AS total_records
+                    FROM vehicle_counts
+                ),
+                latest AS (
+                    SELECT cars, vans, motors, buses, bicycles, datetime_str
+                    FROM vehicle_counts
+                    ORDER BY timestamp DESC
+                    LIMIT 1
+                )
+                SELECT * FROM stats LEFT JOIN latest ON 1
+            """).fetchone()
+        finally:
+            conn.close()
             
     except Exception as e:
         print(f"[ERROR] Database error: {e}")
-        return None
-
-
-def get_statistics_from_db():
-    """Get average counts for more representative data."""
-    if not os.path.exists(DB_PATH):
-        return None
+        return None, None
     
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Get average counts (more representative than single record)
-        cursor.execute("""
-            SELECT 
-                ROUND(AVG(cars)) as avg_cars,
-                ROUND(AVG(vans)) as avg_vans,
-                ROUND(AVG(motors)) as avg_motors,
-                ROUND(AVG(buses)) as avg_buses,
-                ROUND(AVG(bicycles)) as avg_bicycles,
-                COUNT(*) as total_records
-            FROM vehicle_counts
-        """)
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row and row[5] > 0:  # Check if there are records
-            return {
-                'cars': int(row[0] or 0),
-                'vans': int(row[1] or 0),
-                'motors': int(row[2] or 0),
-                'buses': int(row[3] or 0),
-                'bicycles': int(row[4] or 0),
-                'total_records': row[5]
-            }
-        return None
-            
-    except Exception as e:
-        print(f"❌ Database error: {e}")
-        return None
+    if not row or row[5] == 0:  # Check if there are records
+        print("[ERROR] No data found in database.")
+        return None, None
+    
+    stats = {
+        'cars': int(row[0] or 0),
+        'vans': int(row[1] or 0),
+        'motors': int(row[2] or 0),
+        'buses': int(row[3] or 0),
+        'bicycles': int(row[4] or 0),
+        'total_records': row[5]
+    }
+    latest = {
+        'cars': row[6],
+        'vans': row[7],      # trucks in simulation
+        'motors': row[8],    # motorcycles/bikes in simulation
+        'buses': row[9],     # tuk-tuks in simulation
+        'bicycles': row[10],
+        'timestamp': row[11]
+    }
+    return stats, latest
 
 
 def export_to_traffic_data(counts, use_phases=True):
@@ -146,17 +132,20 @@ def export_to_traffic_data(counts, use_phases=True):
         p1_trucks = counts['vans']
         p1_tuktuks = counts['buses']
     
-    # Write to file
+    # Write to a temp file in one call, then swap it in so the simulation never reads a half-written file
     try:
-        with open(OUTPUT_PATH, 'w') as f:
-            f.write(f"{p0_cars}\n")
-            f.write(f"{p0_motos}\n")
-            f.write(f"{p0_trucks}\n")
-            f.write(f"{p0_tuktuks}\n")
-            f.write(f"{p1_cars}\n")
-            f.write(f"{p1_motos}\n")
-            f.write(f"{p1_trucks}\n")
-            f.write(f"{p1_tuktuks}\n")
+        data = "".join(f"{v}\n" for v in (p0_cars, p0_motos, p0_trucks, p0_tuktuks,
+                                            p1_cars, p1_motos, p1_trucks, p1_tuktuks))
+        tmp_path = OUTPUT_PATH + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, OUTPUT_PATH)
+        except Exception:
+            # Don't leave a stray temp file next to traffic_data.txt
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         
         print(f"[OK] Exported to: {OUTPUT_PATH}")
         print(f"\n[DATA] Traffic Data Written:")
@@ -183,7 +172,7 @@ def main():
     
     # Try to get statistics (average) first for more representative data
     print("[INFO] Reading from database...")
-    stats = get_statistics_from_db()
+    stats, latest = get_counts_from_db()
     
     if stats:
         print(f"\n[OK] Found {stats['total_records']} records in database")
@@ -195,7 +184,6 @@ def main():
         print(f"   Bicycles: {stats['bicycles']} (not used in simulation)")
         
         # Also show latest record
-        latest = get_latest_counts_from_db()
         if latest:
             print(f"\n[LATEST] Latest Record ({latest['timestamp']}):")
             print(f"   Cars: {latest['cars']}, Vans: {latest['vans']}, Motors: {latest['motors']}, Buses: {latest['buses']}")
@@ -221,23 +209,8 @@ def main():
             return
             
     else:
-        # Fallback to latest counts only
-        latest = get_latest_counts_from_db()
-        if latest:
-            print(f"\n[OK] Latest Record ({latest['timestamp']}):")
-            print(f"   Cars: {latest['cars']}")
-            print(f"   Vans/Trucks: {latest['vans']}")
-            print(f"   Motorcycles: {latest['motors']}")
-            print(f"   Buses/Tuk-tuks: {latest['buses']}")
-            
-            confirm = input("\nExport this data? (y/n): ").strip().lower()
-            if confirm == 'y':
-                export_to_traffic_data(latest)
-            else:
-                print("[CANCELLED] Cancelled")
-        else:
-            print("\n[ERROR] No data available in database.")
-            print("   Run PassedCounting.py first to generate detection data.")
+        print("\n[ERROR] No data available in database.")
+        print("   Run PassedCounting.py first to generate detection data.")
     
     print("\n" + "=" * 50)
     print("Done! You can now run the simulation:")
@@ -1,9 +1,12 @@
 import random
 import time
-import threading
 import pygame
+import numpy as np
 import sys
 import os
+import functools
+import itertools
+from _kernels import frameSteps
 
 # --- CONFIGURATION ---
 USE_YOLO_DATA = True 
@@ -29,9 +32,13 @@ y = {'right':[498,466,436], 'down':[0,0,0], 'left':[348,370,398], 'up':[800,800,
 vehicles = {'right': {0:[], 1:[], 2:[], 'crossed':0}, 'down': {0:[], 1:[], 2:[], 'crossed':0}, 'left': {0:[], 1:[], 2:[], 'crossed':0}, 'up': {0:[], 1:[], 2:[], 'crossed':0}}
 vehicleTypes = {0:'car', 1:'bus', 2:'truck', 3:'bike'}
 directionNumbers = {0:'right', 1:'down', 2:'left', 3:'up'}
+vehiclesOnRoad = {'right':0, 'down':0, 'left':0, 'up':0} # Spawned but not yet past the stop line
 
 signalCoods = [(530,230),(810,230),(810,570),(530,570)]
 signalTimerCoods = [(530,210),(810,210),(810,550),(530,550)]
+signalToPhase = (0, 1, 0, 1) # Signals 0/2 show phase 0 (right/left), 1/3 phase 1 (down/up)
+phaseDirections = (('right', 'left'), ('down', 'up'))
+signalTexts = ["", "", "", ""]
 stopLines = {'right': 590, 'down': 330, 'left': 800, 'up': 535}
 defaultStop = {'right': 580, 'down': 320, 'left': 810, 'up': 545}
 stoppingGap = 25 
@@ -39,62 +46,64 @@ movingGap = 25
 
 allowedVehicleTypes = {'car': True, 'bus': True, 'truck': True, 'bike': True}
 allowedVehicleTypesList = []
-vehiclesTurned = {'right': {1:[], 2:[]}, 'down': {1:[], 2:[]}, 'left': {1:[], 2:[]}, 'up': {1:[], 2:[]}}
-vehiclesNotTurned = {'right': {1:[], 2:[]}, 'down': {1:[], 2:[]}, 'left': {1:[], 2:[]}, 'up': {1:[], 2:[]}}
 rotationAngle = 3
 mid = {'right': {'x':705, 'y':445}, 'down': {'x':695, 'y':450}, 'left': {'x':695, 'y':425}, 'up': {'x':695, 'y':400}}
 
 timeElapsed = 0
+emptyLaneCounter = 0 # Seconds the green phase has had no vehicles waiting
+spawned_counts = {'car': 0, 'bus': 0, 'truck': 0, 'bike': 0}
 simulationTime = 300
+screenWidth = 1400
+screenHeight = 800
+exitMargin = 200 # Crossed vehicles this far outside the window are retired, wider than any vehicle
 timeElapsedCoods = (1100,50)
 vehicleCountTexts = ["0", "0", "0", "0"]
 vehicleCountCoods = [(480,210),(880,210),(880,550),(480,550)]
 manualSpawnEnabled = True
+manualSpawnKeys = {pygame.K_1: 0, pygame.K_2: 1, pygame.K_3: 2, pygame.K_4: 3} # Key -> direction number
 instructionsCoords = (20, 20)
 
 pygame.init()
-simulation = pygame.sprite.Group()
+
+# Passenger car units per vehicle, in traffic_data.txt order: car, motorbike, truck, tuk-tuk/bus
+pcuWeights = np.array([1.0, 0.3, 2.5, 0.7])
+pcuClasses = {'car': 0, 'bike': 1, 'truck': 2, 'bus': 3} # Vehicle class -> index into pcuWeights
+
+@functools.lru_cache(maxsize=1)
+def readTrafficData(mtimeNs):
+    # Parsed once per version of the file, the mtime is only the cache key
+    counts = np.loadtxt("traffic_data.txt", dtype=np.int64, max_rows=8, ndmin=1)
+    if len(counts) < 4:
+        raise ValueError("traffic_data.txt needs at least the 4 Phase 0 counts")
+    p0 = counts[:4]
+    p1 = counts[4:8] if len(counts) >= 8 else np.array([2, 2, 0, 0])
+    return p0, p1
 
 # --- FUNCTION: READ YOLO DATA ---
 # REPLACE THIS FUNCTION IN YOUR SMART CODE
 def get_smart_timing():
     try:
-        with open("traffic_data.txt", "r") as f:
-            lines = f.readlines()
-            
-            # Phase 0
-            p0_cars = int(lines[0].strip())
-            p0_motos = int(lines[1].strip())
-            p0_trucks = int(lines[2].strip())
-            p0_tuktuks = int(lines[3].strip())
-            
-            # Phase 1
-            if len(lines) >= 8:
-                p1_cars = int(lines[4].strip())
-                p1_motos = int(lines[5].strip())
-                p1_trucks = int(lines[6].strip())
-                p1_tuktuks = int(lines[7].strip())
-            else:
-                p1_cars, p1_motos, p1_trucks, p1_tuktuks = 2, 2, 0, 0
+        p0, p1 = readTrafficData(os.stat("traffic_data.txt").st_mtime_ns)
 
-            # Calculate Initial Green Time based on Phase 0 load
-            total_pcu = (p0_cars * 1.0) + (p0_motos * 0.3) + (p0_trucks * 2.5) + (p0_tuktuks * 0.7)
-            calculated_time = total_pcu * 1.8 * 0.6
-            final_time = int(max(15, min(90, calculated_time)))
-            
-            print(f"[SMART LOGIC] Loaded Phase 0 & Phase 1 Data.")
-            
-            # CORRECTLY COMBINE LIMITS
-            total_limits = {
-                'car': p0_cars + p1_cars,
-                'bike': p0_motos + p1_motos,
-                'truck': p0_trucks + p1_trucks,
-                'bus': p0_tuktuks + p1_tuktuks
-            }
-            
-            return final_time, total_limits
+        # Calculate Initial Green Time based on Phase 0 load
+        total_pcu = p0 @ pcuWeights
+        calculated_time = total_pcu * 1.8 * 0.6
+        final_time = int(max(15, min(90, calculated_time)))
+        
+        print(f"[SMART LOGIC] Loaded Phase 0 & Phase 1 Data.")
+        
+        # CORRECTLY COMBINE LIMITS
+        cars, motos, trucks, tuktuks = (p0 + p1).tolist()
+        total_limits = {
+            'car': cars,
+            'bike': motos,
+            'truck': trucks,
+            'bus': tuktuks
+        }
+        
+        return final_time, total_limits
             
-    except Exception as e:
+    except (OSError, ValueError): # Missing, unreadable or malformed file
         print("[ERROR] Could not read traffic_data.txt. Using default.")
         return 20, {'car': 10, 'bike': 10, 'truck': 2, 'bus': 2}
     
@@ -125,15 +134,17 @@ def generate_final_report_image():
 
     start_x, start_y = 50, 130
     col_widths = [180, 150, 150]
+    col_offsets = [0] + list(itertools.accumulate(col_widths)) # Left edge of each column, last entry is the table width
+    table_width = col_offsets[-1]
     row_height = 50
     headers = ["Direction", "Total Spawned", "Total Crossed"]
     directions = ['right', 'down', 'left', 'up']
 
     for i, header in enumerate(headers):
         text = header_font.render(header, True, BLACK)
-        report_surface.blit(text, (start_x + sum(col_widths[:i]), start_y))
+        report_surface.blit(text, (start_x + col_offsets[i], start_y))
     
-    pygame.draw.line(report_surface, BLACK, (start_x, start_y + 35), (start_x + sum(col_widths), start_y + 35), 3)
+    pygame.draw.line(report_surface, BLACK, (start_x, start_y + 35), (start_x + table_width, start_y + 35), 3)
 
     current_y = start_y + row_height
     grand_total_spawned = 0
@@ -149,17 +160,17 @@ def generate_final_report_image():
 
         for i, data in enumerate(row_data):
             text = data_font.render(data, True, BLACK)
-            report_surface.blit(text, (start_x + sum(col_widths[:i]) + 10, current_y))
+            report_surface.blit(text, (start_x + col_offsets[i] + 10, current_y))
         
-        pygame.draw.line(report_surface, GREY, (start_x, current_y + 35), (start_x + sum(col_widths), current_y + 35), 1)
+        pygame.draw.line(report_surface, GREY, (start_x, current_y + 35), (start_x + table_width, current_y + 35), 1)
         current_y += row_height
 
-    pygame.draw.line(report_surface, BLACK, (start_x, current_y), (start_x + sum(col_widths), current_y), 3)
+    pygame.draw.line(report_surface, BLACK, (start_x, current_y), (start_x + table_width, current_y), 3)
     current_y += 10
     total_row_data = ["GRAND TOTAL", str(grand_total_spawned), str(grand_total_crossed)]
     for i, data in enumerate(total_row_data):
         text = header_font.render(data, True, BLUE) 
-        report_surface.blit(text, (start_x + sum(col_widths[:i]) + 10, current_y))
+        report_surface.blit(text, (start_x + col_offsets[i] + 10, current_y))
 
     timestamp = time.strftime("%Y%m%d-%H%M%S")
     filename = f"traffic_report_{timestamp}.png"
@@ -174,276 +185,212 @@ class TrafficSignal:
         self.green = green
         self.signalText = ""
         
+# --- VEHICLE STATE (structure of arrays) ---
+# Direction codes follow directionNumbers: 0 right, 1 down, 2 left, 3 up.
+# Positions along a direction are signed (multiplied by dirSign) so "front <= stop" and
+# "front < leader's rear - gap" read the same way for all four directions.
+dirSign = np.array([1, 1, -1, -1])
+dirHorizontal = np.array([True, False, True, False])
+spawnSign = tuple(int(s) for s in dirSign) # Plain ints so the spawn coordinates in x/y stay Python ints
+signedStopLine = dirSign * np.array([stopLines[directionNumbers[d]] for d in range(4)])
+signedDefaultStop = dirSign * np.array([defaultStop[directionNumbers[d]] for d in range(4)])
+
+# Indexed [direction, lane]. Lane 1 turns a fixed distance past the stop line, lane 2 at mid; lane 0 never turns
+turnAt = np.full((4, 3), np.inf)
+turnAt[:, 1] = signedStopLine + np.array([40, 50, 70, 60])
+turnAt[:, 2] = dirSign * np.array([mid['right']['x'], mid['down']['y'], mid['left']['x'], mid['up']['y']])
+turnDelta = np.zeros((4, 3, 2))
+turnDelta[:, 1] = [(2, 1.8), (-2.5, 2), (-1.2, -2.8), (1, -1)]
+turnDelta[:, 2] = [(2.8, -2.8), (1.8, 2.4), (-1.8, 1.8), (-2.4, -1.8)]
+exitDirection = np.array([[0, 1, 3], [1, 2, 0], [2, 3, 1], [3, 0, 2]])
+rotateSign = {1: -1, 2: 1}
+
+class Fleet:
+    """Kinematic state of every spawned vehicle, one slot per vehicle in spawn order."""
+    def __init__(self, capacity=256):
+        self.n = 0
+        self.sprites = []
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.w = np.zeros(capacity)
+        self.h = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.stop = np.zeros(capacity) # Signed, see dirSign
+        self.direction = np.zeros(capacity, np.int8)
+        self.pcuClass = np.zeros(capacity, np.int8) # Index into pcuWeights
+        self.lane = np.zeros(capacity, np.int8)
+        self.willTurn = np.zeros(capacity, bool)
+        self.crossed = np.zeros(capacity, bool)
+        self.turned = np.zeros(capacity, bool)
+        self.active = np.zeros(capacity, bool) # False once retired, retired vehicles no longer move
+        self.rotateAngle = np.zeros(capacity, np.int16)
+        self.leader = np.zeros(capacity, np.int32) # Vehicle ahead in the same spawn lane, -1 for none
+        self.crossLeader = np.zeros(capacity, np.int32) # Vehicle ahead after crossing (straight or turned), -1 for none
+        self.lastStraight = np.full((4, 3), -1) # Last vehicle per [direction, lane] to cross without turning
+        self.lastTurned = np.full((4, 3), -1) # Last vehicle per [direction, lane] to finish its turn
+
+    def add(self, sprite, x, y, w, h, speed, stop, direction, pcuClass, lane, willTurn, leader):
+        if self.n == len(self.x):
+            for name, arr in vars(self).items():
+                if isinstance(arr, np.ndarray) and arr.ndim == 1:
+                    setattr(self, name, np.concatenate((arr, np.zeros_like(arr))))
+        i = self.n
+        self.x[i], self.y[i], self.w[i], self.h[i] = x, y, w, h
+        self.speed[i] = speed
+        self.stop[i] = stop
+        self.direction[i] = direction
+        self.pcuClass[i] = pcuClass
+        self.lane[i] = lane
+        self.willTurn[i] = willTurn
+        self.crossed[i] = False
+        self.turned[i] = False
+        self.active[i] = True
+        self.rotateAngle[i] = 0
+        self.leader[i] = leader
+        self.crossLeader[i] = -1
+        self.sprites.append(sprite)
+        self.n += 1
+        return i
+
+    def retire(self, gone):
+        # Stop moving the given slots and drop them as leaders, so nothing queues behind a parked vehicle
+        self.active[gone] = False
+        n = self.n
+        for leaders in (self.leader[:n], self.crossLeader[:n], self.lastStraight, self.lastTurned):
+            leaders[np.isin(leaders, gone)] = -1
+
+fleet = Fleet()
+
+# Scaled vehicle images per (direction, vehicleClass), shared read-only by every vehicle of that kind
+vehicleImages = {}
+
+def getVehicleImage(direction, vehicleClass):
+    key = (direction, vehicleClass)
+    if key not in vehicleImages:
+        path = "images/" + direction + "/" + vehicleClass + ".png"
+        image = pygame.image.load(path).convert_alpha() # Match the display format so blits don't convert
+        scale = scales[vehicleClass]
+        width = int(image.get_width() * scale)
+        height = int(image.get_height() * scale)
+        vehicleImages[key] = pygame.transform.scale(image, (width, height))
+    return vehicleImages[key]
+
+# Turn animation frames per (direction, vehicleClass, rotate sign), one per rotationAngle step up to 90 degrees
+rotationFrames = {}
+
+def getRotationFrames(direction, vehicleClass, image, sign):
+    key = (direction, vehicleClass, sign)
+    if key not in rotationFrames:
+        rotationFrames[key] = [pygame.transform.rotate(image, sign * angle) for angle in range(0, 91, rotationAngle)]
+    return rotationFrames[key]
+
+# Rendered text per (font, text, colours). Timers and counters change at most once a second
+@functools.lru_cache(maxsize=256)
+def renderText(font, text, foreground, background):
+    return font.render(text, True, foreground, background)
+
+def alongAxis(direction, x, y, w, h):
+    """Signed rear and front of each box, measured along the given direction of travel."""
+    horizontal = dirHorizontal[direction]
+    start = np.where(horizontal, x, y)
+    length = np.where(horizontal, w, h)
+    forward = dirSign[direction] > 0
+    rear = np.where(forward, start, -(start + length))
+    front = np.where(forward, start + length, -start)
+    return rear, front
+
+def moveVehicles():
+    """Advance every live vehicle by one frame. All vehicles decide on the positions at the start of the frame."""
+    n = fleet.n
+    if n == 0:
+        return
+    d = fleet.direction[:n]
+    lane = fleet.lane[:n]
+    x, y, w, h = fleet.x[:n], fleet.y[:n], fleet.w[:n], fleet.h[:n]
+    willTurn, crossed, turned = fleet.willTurn[:n], fleet.crossed[:n], fleet.turned[:n]
+
+    # Stop line crossings, in spawn order so the crossing queues keep their order
+    _, front = alongAxis(d, x, y, w, h)
+    for i in np.flatnonzero(~crossed & (front > signedStopLine[d])):
+        crossed[i] = True
+        vehicles[directionNumbers[d[i]]]['crossed'] += 1
+        vehiclesOnRoad[directionNumbers[d[i]]] -= 1
+        if not willTurn[i]:
+            fleet.crossLeader[i] = fleet.lastStraight[d[i], lane[i]]
+            fleet.lastStraight[d[i], lane[i]] = i
+
+    green = np.array([currentGreen == 0, currentGreen == 1, currentGreen == 0, currentGreen == 1]) & (currentYellow == 0)
+    live = np.flatnonzero(fleet.active[:n])
+    dx, dy, turning = frameSteps(live, x, y, w, h, d, lane, fleet.speed[:n], fleet.stop[:n], fleet.leader[:n],
+                                 fleet.crossLeader[:n], willTurn, crossed, turned, green,
+                                 dirSign, dirHorizontal, turnAt, exitDirection, movingGap)
+    x += dx
+    y += dy
+
+    # Turns advance rotationAngle degrees per frame along a fixed arc
+    for i in np.flatnonzero(turning):
+        fleet.rotateAngle[i] += rotationAngle
+        sprite = fleet.sprites[i]
+        sprite.image = sprite.rotFrames[fleet.rotateAngle[i] // rotationAngle]
+        w[i], h[i] = sprite.image.get_size()
+        x[i] += turnDelta[d[i], lane[i], 0]
+        y[i] += turnDelta[d[i], lane[i], 1]
+        if fleet.rotateAngle[i] == 90:
+            turned[i] = True
+            fleet.crossLeader[i] = fleet.lastTurned[d[i], lane[i]]
+            fleet.lastTurned[d[i], lane[i]] = i
+
+    # Anything that could still be held back by a retired vehicle is itself past the window edge
+    outside = (x > screenWidth + exitMargin) | (x + w < -exitMargin) | (y > screenHeight + exitMargin) | (y + h < -exitMargin)
+    gone = np.flatnonzero(fleet.active[:n] & crossed & outside)
+    if len(gone):
+        fleet.retire(gone)
+
 class Vehicle(pygame.sprite.Sprite):
+    """Sprite for one vehicle. Position and movement state live in `fleet` at slot self.i."""
     def __init__(self, lane, vehicleClass, direction_number, direction, will_turn):
         pygame.sprite.Sprite.__init__(self)
         self.lane = lane
         self.vehicleClass = vehicleClass
-        self.speed = speeds[vehicleClass]
         self.direction_number = direction_number
         self.direction = direction
-        self.x = x[direction][lane]
-        self.y = y[direction][lane]
-        self.crossed = 0
         self.willTurn = will_turn
-        self.turned = 0
-        self.rotateAngle = 0
+        self.originalImage = getVehicleImage(direction, vehicleClass)
+        self.image = self.originalImage
+        width, height = self.image.get_size()
+        if will_turn:
+            self.rotFrames = getRotationFrames(direction, vehicleClass, self.originalImage, rotateSign[lane])
+
         vehicles[direction][lane].append(self)
+        vehiclesOnRoad[direction] += 1
         self.index = len(vehicles[direction][lane]) - 1
-        self.crossedIndex = 0
-        path = "images/" + direction + "/" + vehicleClass + ".png"
-        self.originalImage = pygame.image.load(path)
-        scale = scales[vehicleClass]
-        width = int(self.originalImage.get_width() * scale)
-        height = int(self.originalImage.get_height() * scale)
-        self.originalImage = pygame.transform.scale(self.originalImage, (width, height))
-        self.image = self.originalImage.copy()
+        leader = vehicles[direction][lane][self.index-1].i if self.index > 0 else -1
+        if(leader >= 0 and not fleet.active[leader]):
+            leader = -1 # Retired vehicles are off the road, a new spawn must not queue behind one
 
         # Stop Coordinate Logic
-        if(len(vehicles[direction][lane])>1 and vehicles[direction][lane][self.index-1].crossed==0):   
-            if(direction=='right'):
-                self.stop = vehicles[direction][lane][self.index-1].stop - vehicles[direction][lane][self.index-1].image.get_rect().width - stoppingGap         
-            elif(direction=='left'):
-                self.stop = vehicles[direction][lane][self.index-1].stop + vehicles[direction][lane][self.index-1].image.get_rect().width + stoppingGap
-            elif(direction=='down'):
-                self.stop = vehicles[direction][lane][self.index-1].stop - vehicles[direction][lane][self.index-1].image.get_rect().height - stoppingGap
-            elif(direction=='up'):
-                self.stop = vehicles[direction][lane][self.index-1].stop + vehicles[direction][lane][self.index-1].image.get_rect().height + stoppingGap
+        if(leader >= 0 and not fleet.crossed[leader]):
+            leaderLength = fleet.w[leader] if dirHorizontal[direction_number] else fleet.h[leader]
+            stop = fleet.stop[leader] - leaderLength - stoppingGap
         else:
-            self.stop = defaultStop[direction]
-            
-        # Set Initial Position
-        if(direction=='right'):
-            temp = self.image.get_rect().width + stoppingGap    
-            x[direction][lane] -= temp
-        elif(direction=='left'):
-            temp = self.image.get_rect().width + stoppingGap
-            x[direction][lane] += temp
-        elif(direction=='down'):
-            temp = self.image.get_rect().height + stoppingGap
-            y[direction][lane] -= temp
-        elif(direction=='up'):
-            temp = self.image.get_rect().height + stoppingGap
-            y[direction][lane] += temp
-        simulation.add(self)
-
-    def render(self, screen):
-        screen.blit(self.image, (self.x, self.y))
-
-    def move(self):
-        # Retrieve the vehicle directly in front
-        if self.index > 0:
-            prev_vehicle = vehicles[self.direction][self.lane][self.index-1]
+            stop = signedDefaultStop[direction_number]
+
+        self.i = fleet.add(self, x[direction][lane], y[direction][lane], width, height, speeds[vehicleClass],
+                           stop, direction_number, pcuClasses[vehicleClass], lane, will_turn, leader)
+
+        # Set Initial Position of the next vehicle in this lane, one length plus gap further back
+        if(dirHorizontal[direction_number]):
+            x[direction][lane] -= spawnSign[direction_number] * (width + stoppingGap)
         else:
-            prev_vehicle = None
-
-        if(self.direction=='right'):
-            if(self.crossed==0 and self.x+self.image.get_rect().width>stopLines[self.direction]):
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-                if(self.willTurn==0):
-                    vehiclesNotTurned[self.direction][self.lane].append(self)
-                    self.crossedIndex = len(vehiclesNotTurned[self.direction][self.lane]) - 1
-            if(self.willTurn==1):
-                if(self.lane == 1): 
-                    if(self.crossed==0 or self.x+self.image.get_rect().width<stopLines[self.direction]+40):
-                        # UPDATED GAP LOGIC: Check if prev vehicle is turning/crossed
-                        if((self.x+self.image.get_rect().width<=self.stop or (currentGreen==0 and currentYellow==0) or self.crossed==1) and (self.index==0 or self.x+self.image.get_rect().width<(prev_vehicle.x - movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))):               
-                            self.x += self.speed
-                    else:
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                            self.x += 2
-                            self.y += 1.8
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or ((self.y+self.image.get_rect().height)<(vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].y - movingGap))):
-                                self.y += self.speed
-                elif(self.lane == 2): 
-                    if(self.crossed==0 or self.x+self.image.get_rect().width<mid[self.direction]['x']):
-                        if((self.x+self.image.get_rect().width<=self.stop or (currentGreen==0 and currentYellow==0) or self.crossed==1) and (self.index==0 or self.x+self.image.get_rect().width<(prev_vehicle.x - movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))):                
-                            self.x += self.speed
-                    else:
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, self.rotateAngle)
-                            self.x += 2.8
-                            self.y -= 2.8
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or (self.y>(vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].y + vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].image.get_rect().height + movingGap))):
-                                self.y -= self.speed
-            else: 
-                if(self.crossed == 0):
-                    if((self.x+self.image.get_rect().width<=self.stop or (currentGreen==0 and currentYellow==0)) and (self.index==0 or self.x+self.image.get_rect().width<(prev_vehicle.x - movingGap))):                
-                        self.x += self.speed
-                else:
-                    if((self.crossedIndex==0) or (self.x+self.image.get_rect().width<(vehiclesNotTurned[self.direction][self.lane][self.crossedIndex-1].x - movingGap))):                
-                        self.x += self.speed
-        
-        elif(self.direction=='down'):
-            if(self.crossed==0 and self.y+self.image.get_rect().height>stopLines[self.direction]):
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-                if(self.willTurn==0):
-                    vehiclesNotTurned[self.direction][self.lane].append(self)
-                    self.crossedIndex = len(vehiclesNotTurned[self.direction][self.lane]) - 1
-            if(self.willTurn==1):
-                if(self.lane == 1): 
-                    if(self.crossed==0 or self.y+self.image.get_rect().height<stopLines[self.direction]+50):
-                        if((self.y+self.image.get_rect().height<=self.stop or (currentGreen==1 and currentYellow==0) or self.crossed==1) and (self.index==0 or self.y+self.image.get_rect().height<(prev_vehicle.y - movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))):                
-                            self.y += self.speed
-                    else:   
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                            self.x -= 2.5
-                            self.y += 2
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or (self.x>(vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].x + vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].image.get_rect().width + movingGap))): 
-                                self.x -= self.speed
-                elif(self.lane == 2): 
-                    if(self.crossed==0 or self.y+self.image.get_rect().height<mid[self.direction]['y']):
-                        if((self.y+self.image.get_rect().height<=self.stop or (currentGreen==1 and currentYellow==0) or self.crossed==1) and (self.index==0 or self.y+self.image.get_rect().height<(prev_vehicle.y - movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))):                
-                            self.y += self.speed
-                    else:   
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, self.rotateAngle)
-                            self.x += 1.8
-                            self.y += 2.4
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or ((self.x + self.image.get_rect().width) < (vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].x - movingGap))):
-                                self.x += self.speed
-            else: 
-                if(self.crossed == 0):
-                    if((self.y+self.image.get_rect().height<=self.stop or (currentGreen==1 and currentYellow==0)) and (self.index==0 or self.y+self.image.get_rect().height<(prev_vehicle.y - movingGap))):                
-                        self.y += self.speed
-                else:
-                    if((self.crossedIndex==0) or (self.y+self.image.get_rect().height<(vehiclesNotTurned[self.direction][self.lane][self.crossedIndex-1].y - movingGap))):                
-                        self.y += self.speed
-
-        elif(self.direction=='left'):
-            if(self.crossed==0 and self.x<stopLines[self.direction]):
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-                if(self.willTurn==0):
-                    vehiclesNotTurned[self.direction][self.lane].append(self)
-                    self.crossedIndex = len(vehiclesNotTurned[self.direction][self.lane]) - 1
-            if(self.willTurn==1):
-                if(self.lane == 1): 
-                    if(self.crossed==0 or self.x>stopLines[self.direction]-70):
-                        if((self.x>=self.stop or (currentGreen==0 and currentYellow==0) or self.crossed==1) and (self.index==0 or self.x>(prev_vehicle.x + prev_vehicle.image.get_rect().width + movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))):                
-                            self.x -= self.speed
-                    else: 
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                            self.x -= 1.2
-                            self.y -= 2.8
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or (self.y>(vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].y + vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].image.get_rect().height +  movingGap))):
-                                self.y -= self.speed
-                elif(self.lane == 2): 
-                    if(self.crossed==0 or self.x>mid[self.direction]['x']):
-                        if((self.x>=self.stop or (currentGreen==0 and currentYellow==0) or self.crossed==1) and (self.index==0 or self.x>(prev_vehicle.x + prev_vehicle.image.get_rect().width + movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))):                
-                            self.x -= self.speed
-                    else:
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, self.rotateAngle)
-                            self.x -= 1.8
-                            self.y += 1.8
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or ((self.y + self.image.get_rect().height) <(vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].y  -  movingGap))):
-                                self.y += self.speed
-            else: 
-                if(self.crossed == 0):
-                    if((self.x>=self.stop or (currentGreen==0 and currentYellow==0)) and (self.index==0 or self.x>(prev_vehicle.x + prev_vehicle.image.get_rect().width + movingGap))):                
-                        self.x -= self.speed
-                else:
-                    if((self.crossedIndex==0) or (self.x>(vehiclesNotTurned[self.direction][self.lane][self.crossedIndex-1].x + vehiclesNotTurned[self.direction][self.lane][self.crossedIndex-1].image.get_rect().width + movingGap))):                
-                        self.x -= self.speed
-
-        elif(self.direction=='up'):
-            if(self.crossed==0 and self.y<stopLines[self.direction]):
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-                if(self.willTurn==0):
-                    vehiclesNotTurned[self.direction][self.lane].append(self)
-                    self.crossedIndex = len(vehiclesNotTurned[self.direction][self.lane]) - 1
-            if(self.willTurn==1):
-                if(self.lane == 1): 
-                    if(self.crossed==0 or self.y>stopLines[self.direction]-60):
-                        if((self.y>=self.stop or (currentGreen==1 and currentYellow==0) or self.crossed == 1) and (self.index==0 or self.y>(prev_vehicle.y + prev_vehicle.image.get_rect().height +  movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))): 
-                            self.y -= self.speed
-                    else:   
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                            self.x += 1
-                            self.y -= 1
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or (self.x<(vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].x - vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].image.get_rect().width - movingGap))):
-                                self.x += self.speed
-                elif(self.lane == 2): 
-                    if(self.crossed==0 or self.y>mid[self.direction]['y']):
-                        if((self.y>=self.stop or (currentGreen==1 and currentYellow==0) or self.crossed == 1) and (self.index==0 or self.y>(prev_vehicle.y + prev_vehicle.image.get_rect().height +  movingGap) or prev_vehicle.turned==1 or (prev_vehicle.crossed==1 and prev_vehicle.willTurn==1))):  
-                            self.y -= self.speed
-                    else:   
-                        if(self.turned==0):
-                            self.rotateAngle += rotationAngle
-                            self.image = pygame.transform.rotate(self.originalImage, self.rotateAngle)
-                            self.x -= 2.4
-                            self.y -= 1.8
-                            if(self.rotateAngle==90):
-                                self.turned = 1
-                                vehiclesTurned[self.direction][self.lane].append(self)
-                                self.crossedIndex = len(vehiclesTurned[self.direction][self.lane]) - 1
-                        else:
-                            if(self.crossedIndex==0 or (self.x>(vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].x + vehiclesTurned[self.direction][self.lane][self.crossedIndex-1].image.get_rect().width + movingGap))):
-                                self.x -= self.speed
-            else: 
-                if(self.crossed == 0):
-                    if((self.y>=self.stop or (currentGreen==1 and currentYellow==0)) and (self.index==0 or self.y>(prev_vehicle.y + prev_vehicle.image.get_rect().height + movingGap))):                
-                        self.y -= self.speed
-                else:
-                    if((self.crossedIndex==0) or (self.y>(vehiclesNotTurned[self.direction][self.lane][self.crossedIndex-1].y + vehiclesNotTurned[self.direction][self.lane][self.crossedIndex-1].image.get_rect().height + movingGap))):                
-                        self.y -= self.speed 
+            y[direction][lane] -= spawnSign[direction_number] * (height + stoppingGap)
+
 
 def initialize():
     ts1 = TrafficSignal(0, defaultYellow, smart_green_time)
     signals.append(ts1)
     ts2 = TrafficSignal(ts1.yellow+ts1.green, defaultYellow, defaultGreen[1])
     signals.append(ts2)
-    repeat()
+    startGreen()
 
 def printStatus():
     phaseNames = ["X-axis (Right/Left)", "Y-axis (Down/Up)"]
@@ -459,87 +406,62 @@ def printStatus():
     print()  
 
 def calculate_dynamic_green_time(phase):
-    if phase == 0:
-        directions = ['right', 'left']
-    else:
-        directions = ['down', 'up']
-        
-    cars = 0
-    bikes = 0
-    trucks = 0
-    buses = 0
-    
-    for direction in directions:
-        for lane in range(3): 
-            for vehicle in vehicles[direction][lane]:
-                if vehicle.crossed == 0: 
-                    v_type = vehicle.vehicleClass
-                    if v_type == 'car': cars += 1
-                    elif v_type == 'bike': bikes += 1
-                    elif v_type == 'truck': trucks += 1
-                    elif v_type == 'bus': buses += 1
-
-    total_pcu = (cars * 1.0) + (bikes * 0.3) + (trucks * 2.5) + (buses * 0.7)
+    # Vehicles of this phase (right/left or down/up, see the direction codes) still before the stop line
+    n = fleet.n
+    waiting = (fleet.direction[:n] % 2 == phase) & ~fleet.crossed[:n]
+    counts = np.bincount(fleet.pcuClass[:n][waiting], minlength=4)
+    cars, bikes, trucks, buses = counts.tolist()
+
+    total_pcu = counts @ pcuWeights
     calculated_time = int(total_pcu * 1.8 * 0.6)
     final_time = max(10, min(90, calculated_time))
     
     print(f"[REAL-TIME] Phase {phase} Queue: {cars} Cars, {bikes} Bikes. New Time: {final_time}s")
     return final_time
 
+def startGreen():
+    global emptyLaneCounter
+    signals[currentGreen].green = calculate_dynamic_green_time(currentGreen)
+    emptyLaneCounter = 0
+
 def repeat():
-    global currentGreen, currentYellow, nextGreen
-    phaseDirections = {0: ['right', 'left'], 1: ['down', 'up']}
-    
-    real_time_duration = calculate_dynamic_green_time(currentGreen)
-    signals[currentGreen].green = real_time_duration
-    
-    empty_lane_counter = 0 
-    
-    while(signals[currentGreen].green > 0):
-        if currentGreen == 0: 
-            active_dirs = ['right', 'left']
-        else: 
-            active_dirs = ['down', 'up']
-
-        vehicles_still_on_road = 0
-        for direction in active_dirs:
-            total_generated = len(vehicles[direction][0]) + len(vehicles[direction][1]) + len(vehicles[direction][2])
-            total_crossed = vehicles[direction]['crossed']
-            vehicles_still_on_road += (total_generated - total_crossed)
+    # One second of the signal cycle, called from the main loop: green (with gap out), yellow, next phase
+    global currentGreen, currentYellow, nextGreen, emptyLaneCounter
+
+    if(currentYellow==0 and signals[currentGreen].green <= 0):
+        currentYellow = 1 
+        
+        # Every vehicle of the phase going yellow is sent back to its default stop line.
+        # Direction codes alternate phases: right/left are phase 0, down/up phase 1
+        d = fleet.direction[:fleet.n]
+        inPhase = d % 2 == currentGreen
+        fleet.stop[:fleet.n][inPhase] = signedDefaultStop[d[inPhase]]
+
+    if(currentYellow==1 and signals[currentGreen].yellow <= 0):
+        currentYellow = 0 
+        
+        signals[currentGreen].green = defaultGreen[currentGreen]
+        signals[currentGreen].yellow = defaultYellow
+        signals[currentGreen].red = defaultRed
+           
+        currentGreen = nextGreen 
+        nextGreen = (currentGreen+1)%noOfSignals 
+        signals[nextGreen].red = signals[currentGreen].yellow + signals[currentGreen].green 
+        startGreen()
+
+    if(currentYellow==0):
+        vehicles_still_on_road = sum(vehiclesOnRoad[direction] for direction in phaseDirections[currentGreen])
 
         if vehicles_still_on_road == 0:
-            empty_lane_counter += 1 
-            if empty_lane_counter >= 5:
+            emptyLaneCounter += 1 
+            if emptyLaneCounter >= 5:
                 print(f"   [GAP OUT] Empty > 5s. Cutting Green Light Early!")
                 signals[currentGreen].green = 0 
         else:
-            empty_lane_counter = 0 
+            emptyLaneCounter = 0 
 
-        printStatus()
-        updateValues()
-        time.sleep(1)
-        
-    currentYellow = 1 
-    
-    for direction in phaseDirections[currentGreen]:
-        for i in range(0,3):
-            for vehicle in vehicles[direction][i]:
-                vehicle.stop = defaultStop[direction]
-
-    while(signals[currentGreen].yellow > 0): 
-        printStatus()
-        updateValues()
-        time.sleep(1)
-    currentYellow = 0 
-    
-    signals[currentGreen].green = defaultGreen[currentGreen]
-    signals[currentGreen].yellow = defaultYellow
-    signals[currentGreen].red = defaultRed
-       
-    currentGreen = nextGreen 
-    nextGreen = (currentGreen+1)%noOfSignals 
-    signals[nextGreen].red = signals[currentGreen].yellow + signals[currentGreen].green 
-    repeat()
+    printStatus()
+    updateValues()
 
 def updateValues():
     for i in range(0, noOfSignals):
@@ -552,56 +474,29 @@ def updateValues():
             signals[i].red-=1
 
 def generateVehicles():
-    spawned_counts = {'car': 0, 'bus': 0, 'truck': 0, 'bike': 0}
-    
-    while(True):
+    # Spawn one random vehicle, returns the milliseconds until the next spawn
+    if USE_YOLO_DATA:
+        # Only types with YOLO counts left, weighted by how many remain so the mix drains evenly
+        remaining = {t: vehicle_limits[vehicleTypes[t]] - spawned_counts[vehicleTypes[t]] for t in allowedVehicleTypesList}
+        eligible = [t for t in remaining if remaining[t] > 0]
+        if not eligible:
+            return float('inf') # Every counted vehicle is on the road, stop spawning
+        vehicle_type_id = random.choices(eligible, weights=[remaining[t] for t in eligible])[0]
+    else:
         vehicle_type_id = random.choice(allowedVehicleTypesList)
-        vehicle_type_name = vehicleTypes[vehicle_type_id]
-        
-        if USE_YOLO_DATA:
-            if spawned_counts[vehicle_type_name] >= vehicle_limits[vehicle_type_name]:
-                time.sleep(0.5)
-                continue 
-            
-        spawned_counts[vehicle_type_name] += 1
-        
-        lane_number = random.randint(1,2)
-        will_turn = 0
-        if(lane_number == 1):
-            temp = random.randint(0,99)
-            if(temp<40):
-                will_turn = 1
-        elif(lane_number == 2):
-            temp = random.randint(0,99)
-            if(temp<40):
-                will_turn = 1
-        temp = random.randint(0,99)
-        direction_number = 0
-        dist = [25,50,75,100]
-        if(temp<dist[0]):
-            direction_number = 0
-        elif(temp<dist[1]):
-            direction_number = 1
-        elif(temp<dist[2]):
-            direction_number = 2
-        elif(temp<dist[3]):
-            direction_number = 3
-        Vehicle(lane_number, vehicleTypes[vehicle_type_id], direction_number, directionNumbers[direction_number], will_turn)
-        time.sleep(1)
+    spawned_counts[vehicleTypes[vehicle_type_id]] += 1
+    
+    lane_number = random.randint(1,2)
+    will_turn = int(random.randint(0,99) < 40)
+    direction_number = random.randrange(4) # Each direction equally likely
+    Vehicle(lane_number, vehicleTypes[vehicle_type_id], direction_number, directionNumbers[direction_number], will_turn)
+    return 1000
 
 def spawnVehicleManually(direction_number):
     direction = directionNumbers[direction_number]
     vehicle_type = random.choice(allowedVehicleTypesList)
     lane_number = random.randint(1, 2)
-    will_turn = 0
-    if lane_number == 1:
-        temp = random.randint(0, 99)
-        if temp < 40:
-            will_turn = 1
-    elif lane_number == 2:
-        temp = random.randint(0, 99)
-        if temp < 40:
-            will_turn = 1
+    will_turn = int(random.randint(0, 99) < 40)
     
     Vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, direction, will_turn)
     print(f"Vehicle spawned: {vehicleTypes[vehicle_type]} in {direction} lane {lane_number}")
@@ -621,14 +516,13 @@ def showStats():
 
 # --- UPDATED SIMTIME: Generates Report on Timeout ---
 def simTime():
+    # Called once a second from the main loop
     global timeElapsed, simulationTime
-    while(True):
-        timeElapsed += 1
-        time.sleep(1)
-        if(timeElapsed==simulationTime):
-            showStats()
-            generate_final_report_image() # <--- Generates PNG record
-            os._exit(1) 
+    if(timeElapsed==simulationTime):
+        showStats()
+        generate_final_report_image() # <--- Generates PNG record
+        os._exit(1) 
+    timeElapsed += 1
 
 class Main:
     global allowedVehicleTypesList
@@ -637,33 +531,54 @@ class Main:
         if(allowedVehicleTypes[vehicleType]):
             allowedVehicleTypesList.append(i)
         i += 1
-    thread1 = threading.Thread(name="initialization",target=initialize, args=()) 
-    thread1.daemon = True
-    thread1.start()
+    initialize()
 
     black = (0, 0, 0)
     white = (255, 255, 255)
 
-    screenWidth = 1400
-    screenHeight = 800
     screenSize = (screenWidth, screenHeight)
 
-    background = pygame.image.load('images/intersection.png')
-
     screen = pygame.display.set_mode(screenSize)
     pygame.display.set_caption("SMART TRAFFIC SIMULATION (YOLO INTEGRATED)")
-
-    redSignal = pygame.image.load('images/signals/red.png')
-    yellowSignal = pygame.image.load('images/signals/yellow.png')
-    greenSignal = pygame.image.load('images/signals/green.png')
+    # Only queue the events the loop handles, mouse motion etc. never reach Python
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN])
+
+    # Converted to the display format once so blits are plain copies
+    background = pygame.image.load('images/intersection.png').convert()
+    redSignal = pygame.image.load('images/signals/red.png').convert_alpha()
+    yellowSignal = pygame.image.load('images/signals/yellow.png').convert_alpha()
+    greenSignal = pygame.image.load('images/signals/green.png').convert_alpha()
+    signalImages = (redSignal, greenSignal, yellowSignal) # Indexed by state: 0 red, 1 green, 2 yellow
     font = pygame.font.Font(None, 30)
-    thread2 = threading.Thread(name="generateVehicles",target=generateVehicles, args=()) 
-    thread2.daemon = True
-    thread2.start()
-
-    thread3 = threading.Thread(name="simTime",target=simTime, args=()) 
-    thread3.daemon = True
-    thread3.start()
+    instructionFont = pygame.font.Font(None, 20)
+    # Signals, spawning and the elapsed time all run off this clock on the main thread
+    clock = pygame.time.Clock()
+    simulationMs = 0
+    nextSecondMs = 0
+    nextSpawnMs = 0
+
+    # The instructions never change during a run, compose them into one panel up front
+    instructions = [
+        "Smart Traffic Mode Active",
+        f"Calculated Time: {smart_green_time}s",
+        "Press 1-4 to Spawn Manually",
+        "PNG Report Generated on Exit"
+    ]
+    instructionTexts = []
+    for instruction in instructions:
+        instructionTexts.append(instructionFont.render(instruction, True, white, black))
+    panelWidth = max(text.get_width() for text in instructionTexts)
+    panelHeight = (len(instructionTexts) - 1) * 20 + instructionTexts[-1].get_height()
+    instructionPanel = pygame.Surface((panelWidth, panelHeight), pygame.SRCALPHA) # Transparent between lines
+    for i, instructionText in enumerate(instructionTexts):
+        instructionPanel.blit(instructionText, (0, i * 20))
+    instructionPanel = instructionPanel.convert_alpha()
+
+    # Full draw once, after that only the areas that changed are pushed to the display
+    screen.blit(background,(0,0))
+    pygame.display.update()
+    drawnRects = [] # Everything drawn over the background last frame
 
     while True:
         for event in pygame.event.get():
@@ -671,74 +586,58 @@ class Main:
                 showStats()
                 generate_final_report_image() # <--- Generates PNG record on Close
                 sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    spawnVehicleManually(0) 
-                elif event.key == pygame.K_2:
-                    spawnVehicleManually(1) 
-                elif event.key == pygame.K_3:
-                    spawnVehicleManually(2) 
-                elif event.key == pygame.K_4:
-                    spawnVehicleManually(3) 
-
-        screen.blit(background,(0,0)) 
-        signalToPhase = {0: 0, 1: 1, 2: 0, 3: 1} 
-        for i in range(0, 4): 
-            phase = signalToPhase[i]
-            if(phase==currentGreen):
-                if(currentYellow==1):
-                    signalText = signals[phase].yellow
-                    screen.blit(yellowSignal, signalCoods[i])
-                else:
-                    signalText = signals[phase].green
-                    screen.blit(greenSignal, signalCoods[i])
-            else:
-                if(signals[phase].red<=10):
-                    signalText = signals[phase].red
-                else:
-                    signalText = "---"
-                screen.blit(redSignal, signalCoods[i])
-        signalTexts = ["","","",""]
+            elif event.type == pygame.KEYDOWN and event.key in manualSpawnKeys:
+                spawnVehicleManually(manualSpawnKeys[event.key])
+
+        while(simulationMs >= nextSecondMs):
+            simTime()
+            repeat()
+            nextSecondMs += 1000
+        while(simulationMs >= nextSpawnMs):
+            nextSpawnMs += generateVehicles()
+
+        # Put the background back wherever something was drawn last frame
+        screen.blits(zip(itertools.repeat(background), drawnRects, drawnRects), doreturn=0)
+        dirtyRects = drawnRects
+        drawList = [] # Everything drawn this frame, in draw order, for one blits call
 
-        signalToPhase = {0: 0, 1: 1, 2: 0, 3: 1}
-        for i in range(0, 4):  
+        for i in range(0, 4): 
             phase = signalToPhase[i]
-            if(phase==currentGreen):
-                if(currentYellow==1):
-                    timerText = signals[phase].yellow
-                else:
-                    timerText = signals[phase].green
+            if(phase!=currentGreen):
+                state = 0
+                timerText = signals[phase].red if signals[phase].red<=10 else "---"
+            elif(currentYellow==1):
+                state = 2
+                timerText = signals[phase].yellow
             else:
-                if(signals[phase].red<=10):
-                    timerText = signals[phase].red
-                else:
-                    timerText = "---"
-            signalTexts[i] = font.render(str(timerText), True, white, black)
-            screen.blit(signalTexts[i],signalTimerCoods[i])
+                state = 1
+                timerText = signals[phase].green
+            signalTexts[i] = renderText(font, str(timerText), white, black)
+            drawList.append((signalImages[state], signalCoods[i]))
+            drawList.append((signalTexts[i], signalTimerCoods[i]))
 
         for i in range(0, 4):
             displayText = vehicles[directionNumbers[i]]['crossed']
-            vehicleCountTexts[i] = font.render(str(displayText), True, black, white)
-            screen.blit(vehicleCountTexts[i],vehicleCountCoods[i])
+            vehicleCountTexts[i] = renderText(font, str(displayText), black, white)
+            drawList.append((vehicleCountTexts[i], vehicleCountCoods[i]))
 
-        timeElapsedText = font.render(("Time Elapsed: "+str(timeElapsed)), True, black, white)
-        screen.blit(timeElapsedText,timeElapsedCoods)
+        timeElapsedText = renderText(font, "Time Elapsed: "+str(timeElapsed), black, white)
+        drawList.append((timeElapsedText, timeElapsedCoods))
 
         if manualSpawnEnabled:
-            instructionFont = pygame.font.Font(None, 20)
-            instructions = [
-                "Smart Traffic Mode Active",
-                f"Calculated Time: {smart_green_time}s",
-                "Press 1-4 to Spawn Manually",
-                "PNG Report Generated on Exit"
-            ]
-            for i, instruction in enumerate(instructions):
-                instructionText = instructionFont.render(instruction, True, white, black)
-                screen.blit(instructionText, (instructionsCoords[0], instructionsCoords[1] + i * 20))
-
-        for vehicle in simulation:  
-            screen.blit(vehicle.image, [vehicle.x, vehicle.y])
-            vehicle.move()
-        pygame.display.update()
+            drawList.append((instructionPanel, instructionsCoords))
+
+        # Vehicles go last, in spawn order so overlaps draw as before.
+        # Positions come straight from the fleet arrays; vehicles queued or driven off screen are skipped
+        n = fleet.n
+        vx, vy = fleet.x[:n], fleet.y[:n]
+        visible = np.flatnonzero((vx < screenWidth) & (vx + fleet.w[:n] > 0) & (vy < screenHeight) & (vy + fleet.h[:n] > 0))
+        positions = zip(vx[visible].tolist(), vy[visible].tolist())
+        drawList += zip([fleet.sprites[i].image for i in visible], positions)
+        # One C call for the whole frame; the returned rects are next frame's dirty areas
+        drawnRects = screen.blits(drawList)
+        moveVehicles()
+        pygame.display.update(dirtyRects + drawnRects)
+        simulationMs += clock.tick(60)
 
 Main()
\ No newline at end of file
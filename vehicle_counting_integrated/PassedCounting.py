@@ -3,11 +3,13 @@ import numpy as np
 from ultralytics import YOLO
 import cv2
 import cvzone
-import math
 from sort import Sort
 import time
 import os
 import sys
+import queue
+import threading
+import argparse
 import logging
 from pathlib import Path
 
@@ -84,38 +86,11 @@ def sanitize_output_path(output_path):
         logger.error(f"Output path validation error: {str(e)}")
         raise
 
-def calculate_iou(box1, box2):
-    """Calculate Intersection over Union with input validation"""
-    try:
-        if len(box1) != 4 or len(box2) != 4:
-            logger.warning("Invalid box dimensions for IoU calculation")
-            return 0
-        
-        x1, y1, x2, y2 = box1
-        x1_g, y1_g, x2_g, y2_g = box2
-
-        xi1 = max(x1, x1_g)
-        yi1 = max(y1, y1_g)
-        xi2 = min(x2, x2_g)
-        yi2 = min(y2, y2_g)
-        inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
-
-        box1_area = (x2 - x1) * (y2 - y1)
-        box2_area = (x2_g - x1_g) * (y2_g - y1_g)
-        union_area = box1_area + box2_area - inter_area
-
-        if union_area == 0:
-            return 0
-        
-        return inter_area / union_area
-    except Exception as e:
-        logger.error(f"IoU calculation error: {str(e)}")
-        return 0
-
 def validate_config(config):
     """Validate configuration parameters"""
     try:
         assert config['interval'] > 0, "Interval must be positive"
+        assert config['batch_size'] > 0, "Batch size must be positive"
         assert config['confidence_threshold'] > 0 and config['confidence_threshold'] <= 1, "Confidence must be between 0 and 1"
         assert all(isinstance(v, int) for v in config['limits']), "Limits must be integers"
         logger.info("Configuration validated successfully")
@@ -124,19 +99,50 @@ def validate_config(config):
         logger.error(f"Configuration validation error: {str(e)}")
         raise
 
-def main():
+def reader(cap, frame_queue, frame_size, stop):
+    """Decode and resize frames in the background so capture overlaps with inference"""
+    while not stop.is_set():
+        success, img = cap.read()
+        if not success:
+            frame_queue.put(None)  # End-of-video marker
+            break
+        frame_queue.put(cv2.resize(img, frame_size))
+
+def read_batch(frame_queue, batch_size):
+    """Pull up to batch_size frames from the reader thread, fewer at the end of the video"""
+    frames = []
+    while len(frames) < batch_size:
+        img = frame_queue.get()
+        if img is None:
+            frame_queue.put(None)  # Leave the marker so the next call also sees the end
+            break
+        frames.append(img)
+    return frames
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Count vehicles passing a line in a video")
+    parser.add_argument("--headless", action="store_true",
+                        help="Skip all drawing and the preview window, stop with Ctrl+C")
+    return parser.parse_args()
+
+def main(args):
     try:
         # Configuration with validation
         config = {
             'video_path': os.path.join(PROJECT_ROOT, "Videos", "Kampuchea_krom.MOV"),
             'model_path': os.path.join(PROJECT_ROOT, "Version1.pt"),
+            'engine_path': os.path.join(PROJECT_ROOT, "Version1.engine"),
             'mask_path': os.path.join(SCRIPT_DIR, "Masks", "project.png"),
             'output_path': os.path.join(SCRIPT_DIR, "vehicle_countsversion2.txt"),
             'output_log': os.path.join(SCRIPT_DIR, "vehicle_detection.log"),
             'interval': 10,
             'confidence_threshold': 0.3,
             'limits': [250, 267, 677, 267],
-            'frame_size': (960, 540)
+            'frame_size': (960, 540),
+            'imgsz': (480, 448),  # Fits the 430x486 mask ROI, must match IMGSZ in scripts/export_tensorrt.py
+            'batch_size': 8,  # Frames per YOLO call, at most the engine's export batch
+            'show_ui': not args.headless  # --headless skips all drawing and the preview window
         }
         
         # Validate configuration
@@ -162,9 +168,26 @@ def main():
         device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"Using device: {device}")
         
-        # Load YOLO model
-        model = YOLO(config['model_path']).to(device)
-        logger.info(f"Model loaded successfully: {config['model_path']}")
+        # FP16 inference on the GPU, halves activation memory traffic on the .pt path
+        half = device == "cuda"
+
+        # Load YOLO model, preferring the TensorRT FP16 engine when it has been exported
+        model = None
+        if device == "cuda" and os.path.isfile(config['engine_path']):
+            try:
+                model = YOLO(config['engine_path'], task="detect")
+                # Run one full dummy batch now, so an engine built for another GPU, TensorRT version,
+                # imgsz or batch size fails here instead of on every batch of the video
+                dummy = np.zeros((*config['imgsz'], 3), np.uint8)
+                model([dummy] * config['batch_size'], imgsz=config['imgsz'], half=half, verbose=False)
+                logger.info(f"TensorRT engine loaded successfully: {config['engine_path']}")
+            except Exception as e:
+                logger.warning(f"TensorRT engine unusable, falling back to the .pt weights: {str(e)}")
+                print(f" Warning: TensorRT engine unusable ({e}), using {config['model_path']}")
+                model = None
+        if model is None:
+            model = YOLO(config['model_path']).to(device)
+            logger.info(f"Model loaded successfully: {config['model_path']}")
 
         # COCO class names
         classNames = [
@@ -180,13 +203,22 @@ def main():
             "teddy bear", "hair drier", "toothbrush"
         ]
 
+        # Class ids that are counted, so the detection filter is one vectorised test
+        countedClassIds = [i for i, name in enumerate(classNames)
+                           if name in ["car", "bus", "truck", "tuk-tuk", "motorcycle", "bicycle"]]
+
         # Load and validate mask image
         mask = cv2.imread(config['mask_path'])
         if mask is None:
             logger.error(f"Failed to load mask: {config['mask_path']}")
             raise ValueError("Mask image could not be loaded")
         mask = cv2.resize(mask, config['frame_size'])
-        logger.info("Mask loaded successfully")
+        # Binarise once: the PNG's white is 242-245, which bitwise_and would otherwise use to clear pixel bits
+        _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+        # YOLO only sees the mask's bounding box; boxes are shifted back by (roi_x, roi_y)
+        roi_x, roi_y, roi_w, roi_h = cv2.boundingRect(cv2.findNonZero(cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)))
+        maskROI = mask[roi_y:roi_y + roi_h, roi_x:roi_x + roi_w]
+        logger.info(f"Mask loaded successfully, inference ROI {roi_w}x{roi_h} at ({roi_x}, {roi_y})")
 
         # Initialize SORT tracker
         tracker = Sort(max_age=20, min_hits=3, iou_threshold=0.3)
@@ -194,14 +226,11 @@ def main():
 
         # Line crossing limits
         limits = config['limits']
-        totalCar = []
-        totalBus = []
-        totalVan = []
-        totalMotor = []
-        totalBicycle = []
-
-        freeze_frame = False
-        img_frozen = None
+        totalCar = set()
+        totalBus = set()
+        totalVan = set()
+        totalMotor = set()
+        totalBicycle = set()
 
         # Initialize database for storing vehicle counts
         db = None
@@ -228,146 +257,146 @@ def main():
 
         logger.info("Processing started")
 
-        while True:
+        show_ui = config['show_ui']
+        if not show_ui:
+            logger.info("Running headless, stop with Ctrl+C")
+
+        # Bounded so decode can't run far ahead of the GPU
+        frame_queue = queue.Queue(maxsize=2 * config['batch_size'])
+        stop_reader = threading.Event()
+        reader_thread = threading.Thread(target=reader, args=(cap, frame_queue, config['frame_size'], stop_reader), daemon=True)
+        reader_thread.start()
+
+        running = True
+        while running:
             try:
-                if not freeze_frame:
-                    success, img = cap.read()
-                    if not success:
-                        logger.info("Video processing completed")
-                        break
-                    img_frozen = img.copy()
-                    img = cv2.resize(img, config['frame_size'])
-                else:
-                    img = img_frozen
-
-                if img is None:
-                    logger.warning("Empty frame detected")
+                frames = read_batch(frame_queue, config['batch_size'])
+                if not frames:
+                    logger.info("Video processing completed")
                     break
-                
-                frame_count += 1
-                
-                imgRegion = cv2.bitwise_and(img, mask)
-                results = model(imgRegion, stream=True)
-                detections = np.empty((0, 6))
-
-                for r in results:
-                    for box in r.boxes:
+
+                # One model call per batch, results come back in frame order
+                # Crop to the ROI, then black out the non-mask pixels inside it
+                imgRegions = [cv2.bitwise_and(img[roi_y:roi_y + roi_h, roi_x:roi_x + roi_w], maskROI) for img in frames]
+                batch_results = model(imgRegions, stream=False, imgsz=config['imgsz'], half=half, verbose=False)
+            except Exception as e:
+                logger.error(f"Error in main loop at frame {frame_count}: {str(e)}")
+                continue
+
+            # SORT and the line check stay sequential, one frame at a time
+            for img, r in zip(frames, batch_results):
+                try:
+                    frame_count += 1
+
+                    # One device-to-host copy per frame instead of three per box
+                    data = r.boxes.data.cpu().numpy()  # (N, 6): x1, y1, x2, y2, conf, cls
+                    xyxy = data[:, :4].astype(np.int32) + (roi_x, roi_y, roi_x, roi_y)
+                    conf = data[:, 4]
+                    cls = data[:, 5].astype(np.int32)
+                    keep = np.isin(cls, countedClassIds) & (conf > config['confidence_threshold'])
+
+                    detections = np.column_stack((xyxy[keep], conf[keep], cls[keep])).astype(np.float32)
+
+                    resultsTracker = tracker.update(detections[:, :5])
+
+                    if show_ui:
+                        cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 0, 255), 5)
+
+                    for result in resultsTracker:
                         try:
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
+                            x1, y1, x2, y2, id, det_idx = map(int, result)
                             w, h = x2 - x1, y2 - y1
-                            conf = math.ceil(box.conf[0] * 100) / 100
-                            cls = int(box.cls[0])
-                            
-                            if cls >= len(classNames):
-                                logger.warning(f"Invalid class index: {cls}")
-                                continue
-                            
-                            currentClass = classNames[cls]
-
-                            if currentClass in ["car", "bus", "truck", "tuk-tuk", "motorcycle", "bicycle"] and conf > config['confidence_threshold']:
-                                currentArray = np.array([x1, y1, x2, y2, conf, cls])
-                                detections = np.vstack((detections, currentArray))
+                            cx, cy = x1 + w // 2, y1 + h // 2
+                            if show_ui:
+                                cvzone.cornerRect(img, (x1, y1, w, h), l=9, rt=2, colorR=(255, 0, 255))
+                                cvzone.putTextRect(img, f' {int(id)}', (max(0, x1), max(35, y1)), scale=2, thickness=2, offset=10)
+                                cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
+
+                            # SORT reports which detection row updated this track, so the class is a direct lookup
+                            if det_idx >= 0:
+                                cls = int(detections[det_idx, 5])
+                                if cls >= len(classNames):
+                                    logger.warning(f"Invalid class index in tracking: {cls}")
+                                    continue
+                                currentClass = classNames[cls]
+
+                                if limits[0] < cx < limits[2] and limits[1] - 15 < cy < limits[1] + 15:
+                                    newCrossing = False
+                                    if currentClass == "car" and id not in totalCar:
+                                        totalCar.add(id)
+                                        newCrossing = True
+                                    elif currentClass == "bus" and id not in totalBus:
+                                        totalBus.add(id)
+                                        newCrossing = True
+                                    elif (currentClass == "truck" or currentClass == "tuk-tuk") and id not in totalVan:
+                                        totalVan.add(id)
+                                        newCrossing = True
+                                    elif currentClass == "motorcycle" and id not in totalMotor:
+                                        totalMotor.add(id)
+                                        newCrossing = True
+                                    elif currentClass == "bicycle" and id not in totalBicycle:
+                                        totalBicycle.add(id)
+                                        newCrossing = True
+                                    if show_ui and newCrossing:
+                                        cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 255, 0), 5)
                         except Exception as e:
-                            logger.warning(f"Error processing detection: {str(e)}")
+                            logger.warning(f"Error processing tracker result: {str(e)}")
                             continue
 
-                resultsTracker = tracker.update(detections[:, :5])
-
-                cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 0, 255), 5)
-
-                for result in resultsTracker:
-                    try:
-                        x1, y1, x2, y2, id = map(int, result)
-                        w, h = x2 - x1, y2 - y1
-                        cvzone.cornerRect(img, (x1, y1, w, h), l=9, rt=2, colorR=(255, 0, 255))
-                        cvzone.putTextRect(img, f' {int(id)}', (max(0, x1), max(35, y1)), scale=2, thickness=2, offset=10)
-
-                        cx, cy = x1 + w // 2, y1 + h // 2
-                        cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
-
-                        best_iou = 0
-                        best_detection = None
-                        for det in detections:
-                            dx1, dy1, dx1_g, dy2_g, conf, cls = map(int, det)
-                            iou_val = calculate_iou((x1, y1, x2, y2), (dx1, dy1, dx1_g, dy2_g))
-                            if iou_val > best_iou:
-                                best_iou = iou_val
-                                best_detection = det
-
-                        if best_detection is not None:
-                            cls = int(best_detection[5])
-                            if cls >= len(classNames):
-                                logger.warning(f"Invalid class index in tracking: {cls}")
-                                continue
-                            currentClass = classNames[cls]
-
-                            if limits[0] < cx < limits[2] and limits[1] - 15 < cy < limits[1] + 15:
-                                if currentClass == "car" and id not in totalCar:
-                                    totalCar.append(id)
-                                    cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 255, 0), 5)
-                                elif currentClass == "bus" and id not in totalBus:
-                                    totalBus.append(id)
-                                    cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 255, 0), 5)
-                                elif (currentClass == "truck" or currentClass == "tuk-tuk") and id not in totalVan:
-                                    totalVan.append(id)
-                                    cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 255, 0), 5)
-                                elif currentClass == "motorcycle" and id not in totalMotor:
-                                    totalMotor.append(id)
-                                    cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 255, 0), 5)
-                                elif currentClass == "bicycle" and id not in totalBicycle:
-                                    totalBicycle.append(id)
-                                    cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 255, 0), 5)
-                    except Exception as e:
-                        logger.warning(f"Error processing tracker result: {str(e)}")
-                        continue
-
-                # Check if interval has passed and write counts
-                current_time = time.time() - start_time
-                if current_time - last_write_time >= interval:
-                    output_file.write(f"Time {current_time:.1f}s: Cars: {len(totalCar)}, Vans: {len(totalVan)}, Motors: {len(totalMotor)}, Buses: {len(totalBus)}, Bicycles: {len(totalBicycle)}\n")
-                    output_file.flush()
-                    last_write_time = current_time
-                    logger.info(f"Counts written at {current_time:.1f}s - Cars: {len(totalCar)}, Vans: {len(totalVan)}, Motors: {len(totalMotor)}, Buses: {len(totalBus)}, Bicycles: {len(totalBicycle)}")
-
-                # Save to database at regular intervals
-                current_time_real = time.time()
-                if db and (current_time_real - last_db_save) >= db_save_interval:
-                    try:
-                        vehicle_counts = {
-                            'cars': len(totalCar),
-                            'vans': len(totalVan),
-                            'motors': len(totalMotor),
-                            'buses': len(totalBus),
-                            'bicycles': len(totalBicycle)
-                        }
-                        success = db.save_vehicle_counts(vehicle_counts)
-                        if success:
-                            print(f" Saved to DB - Cars: {vehicle_counts['cars']}, Vans: {vehicle_counts['vans']}, Motors: {vehicle_counts['motors']}, Buses: {vehicle_counts['buses']}, Bicycles: {vehicle_counts['bicycles']}")
-                            logger.info(f"Saved to database - {vehicle_counts}")
-                        last_db_save = current_time_real
-                    except Exception as e:
-                        print(f" Error saving to database: {e}")
-                        logger.error(f"Database save error: {e}")
-
-                cv2.putText(img, f"Cars: {len(totalCar)}", (50, 50), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-                cv2.putText(img, f"Vans: {len(totalVan)}", (50, 100), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-                cv2.putText(img, f"Motors: {len(totalMotor)}", (50, 150), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-                cv2.putText(img, f"Bus: {len(totalBus)}", (50, 200), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-
-                cv2.imshow("Image", img)
-
-                key = cv2.waitKey(1) & 0xFF
-
-                if key == ord('q'):
-                    logger.info("Processing stopped by user")
-                    break
-                elif key == ord('f'):
-                    freeze_frame = not freeze_frame
-                    
-            except Exception as e:
-                logger.error(f"Error in main loop at frame {frame_count}: {str(e)}")
-                continue
+                    # Check if interval has passed and write counts
+                    current_time = time.time() - start_time
+                    if current_time - last_write_time >= interval:
+                        output_file.write(f"Time {current_time:.1f}s: Cars: {len(totalCar)}, Vans: {len(totalVan)}, Motors: {len(totalMotor)}, Buses: {len(totalBus)}, Bicycles: {len(totalBicycle)}\n")
+                        output_file.flush()
+                        last_write_time = current_time
+                        logger.info(f"Counts written at {current_time:.1f}s - Cars: {len(totalCar)}, Vans: {len(totalVan)}, Motors: {len(totalMotor)}, Buses: {len(totalBus)}, Bicycles: {len(totalBicycle)}")
+
+                    # Save to database at regular intervals
+                    current_time_real = time.time()
+                    if db and (current_time_real - last_db_save) >= db_save_interval:
+                        try:
+                            vehicle_counts = {
+                                'cars': len(totalCar),
+                                'vans': len(totalVan),
+                                'motors': len(totalMotor),
+                                'buses': len(totalBus),
+                                'bicycles': len(totalBicycle)
+                            }
+                            success = db.save_vehicle_counts(vehicle_counts)
+                            if success:
+                                print(f" Saved to DB - Cars: {vehicle_counts['cars']}, Vans: {vehicle_counts['vans']}, Motors: {vehicle_counts['motors']}, Buses: {vehicle_counts['buses']}, Bicycles: {vehicle_counts['bicycles']}")
+                                logger.info(f"Saved to database - {vehicle_counts}")
+                            last_db_save = current_time_real
+                        except Exception as e:
+                            print(f" Error saving to database: {e}")
+                            logger.error(f"Database save error: {e}")
+
+                    if show_ui:
+                        cv2.putText(img, f"Cars: {len(totalCar)}", (50, 50), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+                        cv2.putText(img, f"Vans: {len(totalVan)}", (50, 100), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+                        cv2.putText(img, f"Motors: {len(totalMotor)}", (50, 150), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+                        cv2.putText(img, f"Bus: {len(totalBus)}", (50, 200), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+
+                        cv2.imshow("Image", img)
+
+                        key = cv2.waitKey(1) & 0xFF
+
+                        if key == ord('f'):
+                            # Hold the current frame until 'f' is pressed again
+                            key = 0
+                            while key not in (ord('f'), ord('q')):
+                                key = cv2.waitKey(0) & 0xFF
+                        if key == ord('q'):
+                            logger.info("Processing stopped by user")
+                            running = False
+                            break
+
+                except Exception as e:
+                    logger.error(f"Error in main loop at frame {frame_count}: {str(e)}")
+                    continue
 
+    except KeyboardInterrupt:
+        logger.info("Processing stopped by user")
     except Exception as e:
         logger.error(f"Fatal error: {str(e)}")
         print(f"Error: {str(e)}")
@@ -376,9 +405,16 @@ def main():
         try:
             if 'output_file' in locals():
                 output_file.close()
+            if 'reader_thread' in locals():
+                # Unblock a pending put, then let the reader finish before the capture is released
+                stop_reader.set()
+                while not frame_queue.empty():
+                    frame_queue.get_nowait()
+                reader_thread.join(timeout=1)
             if 'cap' in locals():
                 cap.release()
-            cv2.destroyAllWindows()
+            if 'config' in locals() and config['show_ui']:
+                cv2.destroyAllWindows()
             
             # Save final counts to database
             if db:
@@ -407,4 +443,4 @@ def main():
             logger.error(f"Error during cleanup: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(parse_args())
\ No newline at end of file
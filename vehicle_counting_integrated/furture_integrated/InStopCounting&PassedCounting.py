@@ -3,34 +3,82 @@ import numpy as np
 from ultralytics import YOLO
 import cv2
 import cvzone
-import math
+import os
+import queue
+import threading
 from sort import Sort
 
-def calculate_iou(box1, box2):
-    x1, y1, x2, y2 = box1
-    x1_g, y1_g, x2_g, y2_g = box2
+try:
+    from numba import njit
+except ImportError: # numba is optional, the counting kernel then runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda f: f
 
-    xi1 = max(x1, x1_g)
-    yi1 = max(y1, y1_g)
-    xi2 = min(x2, x2_g)
-    yi2 = min(y2, y2_g)
-    inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
-
-    box1_area = (x2 - x1) * (y2 - y1)
-    box2_area = (x2_g - x1_g) * (y2_g - y1_g)
-    union_area = box1_area + box2_area - inter_area
-
-    return inter_area / union_area
+def reader(cap, frame_queue):
+    # Decode and resize frames in the background so capture overlaps with inference
+    while True:
+        success, img = cap.read()
+        if not success:
+            frame_queue.put(None) # End-of-video marker
+            break
+        frame_queue.put(cv2.resize(img, (960, 540))) # Match the mask dimensions
+
+def read_batch(frame_queue, batch_size):
+    # Pull up to batch_size frames from the reader thread
+    frames = []
+    while len(frames) < batch_size:
+        img = frame_queue.get()
+        if img is None:
+            frame_queue.put(None) # Leave the marker so the next call also sees the end
+            break
+        frames.append(img)
+    return frames
+
+@njit(cache=True)
+def count_frame(tracks, kinds, area_mask, limits):
+    # Per-kind counts inside area_mask and a mask of tracks whose centre is in the crossing band
+    area_counts = np.zeros(5, np.int64)
+    crossed = np.zeros(tracks.shape[0], np.bool_)
+    h, w = area_mask.shape
+    for i in range(tracks.shape[0]):
+        kind = kinds[i]
+        if kind < 0:
+            continue
+        cx = tracks[i, 0] + (tracks[i, 2] - tracks[i, 0]) // 2
+        cy = tracks[i, 1] + (tracks[i, 3] - tracks[i, 1]) // 2
+
+        if 0 <= cx < w and 0 <= cy < h and area_mask[cy, cx]:
+            area_counts[kind] += 1
+
+        if limits[0] < cx < limits[2] and limits[1] - 15 < cy < limits[1] + 15:
+            crossed[i] = True
+    return area_counts, crossed
+
+# Frames per YOLO call, tune per GPU (8-16 keeps the device busy)
+BATCH_SIZE = 8
+# Inference size, must match the engine built by scripts/export_tensorrt.py
+INFER_IMGSZ = (480, 448) # Fits the 430x486 mask ROI
+# Run YOLO on every k-th frame; SORT's Kalman filter carries the tracks in between.
+# 2 is safe for the 30 px crossing band at 30 fps (vehicles move < 15 px per frame)
+DETECT_EVERY = 2
 
 # Load video
 cap = cv2.VideoCapture("Videos/Kampuchea_krom.MOV")
+frame_queue = queue.Queue(maxsize=2 * BATCH_SIZE) # Bounded so decode can't run far ahead of the GPU
+threading.Thread(target=reader, args=(cap, frame_queue), daemon=True).start()
 
 # Check for GPU
 device = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"Using device: {device}")
 
-# Load YOLO model
-model = YOLO("Version1.pt").to(device)
+# Load YOLO model, preferring the TensorRT FP16 engine when it has been exported
+if device == "cuda" and os.path.isfile("Version1.engine"):
+    model = YOLO("Version1.engine", task="detect")
+else:
+    model = YOLO("Version1.pt").to(device)
+
+# FP16 inference on the GPU, halves activation memory traffic on the .pt path
+half = device == "cuda"
 
 # COCO class names
 classNames = [
@@ -46,141 +94,138 @@ classNames = [
                 "teddy bear", "hair drier", "toothbrush"
             ]
 
+# Vehicle kind per class id (-1 = not counted), replaces per-box string comparisons
+CAR, BUS, VAN, MOTOR, BICYCLE = range(5)
+VEHICLE_KIND = np.full(len(classNames), -1, np.int8)
+for name, kind in (("car", CAR), ("bus", BUS), ("truck", VAN), ("tuk-tuk", VAN),
+                   ("motorcycle", MOTOR), ("bicycle", BICYCLE)):
+    if name in classNames:
+        VEHICLE_KIND[classNames.index(name)] = kind
+
 # Load mask image
 mask = cv2.imread("car_counting/project.png")
 mask = cv2.resize(mask, (960, 540))
+# Binarise so resize leftovers don't widen the ROI and bitwise_and keeps pixels intact (the PNG's white is 242-245)
+_, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+
+# YOLO only sees the mask's bounding box; boxes are shifted back by (ROI_X, ROI_Y)
+ROI_X, ROI_Y, ROI_W, ROI_H = cv2.boundingRect(cv2.findNonZero(cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)))
+maskROI = mask[ROI_Y:ROI_Y + ROI_H, ROI_X:ROI_X + ROI_W]
 
 # Initialize SORT tracker
 tracker = Sort(max_age=20, min_hits=3, iou_threshold=0.3) # Intersection over Union Treshold
 
 # Define the counting area
 counting_area = [(250, 60), (677, 60), (677, 250), (250, 250)]
+COUNTING_POLY = np.array(counting_area, np.int32) # Built once, reused by polylines
+# Pixel occupancy of the counting area, so the per-track inside test is a single lookup
+AREA_MASK = np.zeros((540, 960), np.uint8)
+cv2.fillPoly(AREA_MASK, [COUNTING_POLY], 1)
 
 # Line crossing limits for cumulative count
 limits = [250, 267, 677, 267] # Original limits
-totalCar_line = [] # Cumulative count for line crossing
-totalBus_line = []
-totalVan_line = []
-totalMotor_line = []
-totalBicycle_line = []
-
-freeze_frame = False
-img_frozen = None
-
-while True:
-    if not freeze_frame:
-        success, img = cap.read()
-        if not success:
-            break
-        img_frozen = img.copy()
-        img = cv2.resize(img, (960, 540)) # Resize img to match mask dimensions
-    else:
-        img = img_frozen
-
-    if img is None: # Handle case where video might end while frozen or initial read fails
+LIMITS = np.array(limits, np.int64)
+totalCar_line = set() # Cumulative count for line crossing (track IDs)
+totalBus_line = set()
+totalVan_line = set()
+totalMotor_line = set()
+totalBicycle_line = set()
+totals_line = (totalCar_line, totalBus_line, totalVan_line, totalMotor_line, totalBicycle_line) # Indexed by kind
+
+# Compile the counting kernel before the first frame
+count_frame(np.zeros((0, 6), np.int64), np.zeros(0, np.int8), AREA_MASK, LIMITS)
+
+# Vehicle kind per track ID, remembered for frames where the track isn't matched to a detection
+track_kind = {}
+
+running = True
+frame_idx = 0
+
+while running:
+    frames = read_batch(frame_queue, BATCH_SIZE)
+    if not frames: # Video ended
         break
 
-    imgRegion = cv2.bitwise_and(img, mask) # set the region of interest
-    # img = cvzone.overlayPNG(img, imgGraphics, (0, 0))
+    detect = [(frame_idx + i) % DETECT_EVERY == 0 for i in range(len(frames))]
 
-    results = model(imgRegion, stream=True)
-    detections = np.empty((0, 6))
+    # Crop to the ROI, then black out the non-mask pixels inside it
+    imgRegions = [cv2.bitwise_and(img[ROI_Y:ROI_Y + ROI_H, ROI_X:ROI_X + ROI_W], maskROI)
+                  for img, d in zip(frames, detect) if d]
+    # img = cvzone.overlayPNG(img, imgGraphics, (0, 0))
 
-    for r in results:
-        for box in r.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
+    # One model call for the detection frames of the batch, results come back in frame order
+    batch_results = iter(model(imgRegions, stream=False, imgsz=INFER_IMGSZ, half=half, verbose=False) if imgRegions else [])
+
+    for img, d in zip(frames, detect):
+        frame_idx += 1
+
+        if d:
+            # One device-to-host copy per frame instead of three per box
+            data = next(batch_results).boxes.data.cpu().numpy() # (N, 6): x1, y1, x2, y2, conf, cls
+            xyxy = data[:, :4].astype(np.int32) + (ROI_X, ROI_Y, ROI_X, ROI_Y)
+            conf = data[:, 4]
+            cls = data[:, 5].astype(np.int32)
+            keep = (VEHICLE_KIND[cls] >= 0) & (conf > 0.3)
+
+            detections = np.column_stack((xyxy[keep], conf[keep], cls[keep])).astype(np.float32)
+            resultsTracker = tracker.update(detections[:, :5])
+        else:
+            # Skipped frame, tracks move on their Kalman prediction alone
+            resultsTracker = tracker.predict()
+
+        # Draw the counting area
+        cv2.polylines(img, [COUNTING_POLY], isClosed=True, color=(0, 255, 0), thickness=2)
+        # Draw the line crossing limits
+        cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 0, 255), 5)
+
+        tracks = resultsTracker.astype(np.int64)
+
+        # SORT reports which detection row updated each track, so the vehicle kind is a direct lookup
+        for id, det_idx in tracks[:, 4:6]:
+            if det_idx >= 0:
+                track_kind[id] = VEHICLE_KIND[int(detections[det_idx, 5])]
+        kinds = np.array([track_kind.get(id, -1) for id in tracks[:, 4]], np.int8)
+        # Only keep kinds for live tracks, so the dict doesn't grow with every ID a long stream sees
+        track_kind = {id: kind for id, kind in zip(tracks[:, 4].tolist(), kinds.tolist()) if kind >= 0}
+
+        # Area counts for the current frame and line crossings (cumulative)
+        area_counts, crossed = count_frame(tracks, kinds, AREA_MASK, LIMITS)
+        cars_in_area, bus_in_area, vans_in_area, motors_in_area, bicycles_in_area = area_counts
+
+        for (x1, y1, x2, y2, id, det_idx), kind, hit in zip(tracks.tolist(), kinds, crossed):
             w, h = x2 - x1, y2 - y1
-            conf = math.ceil(box.conf[0] * 100) / 100
-            cls = int(box.cls[0])
-            currentClass = classNames[cls]
-
-            if currentClass in ["car", "bus", "truck", "tuk-tuk", "motorcycle", "bicycle"] and conf > 0.3:
-                currentArray = np.array([x1, y1, x2, y2, conf, cls])
-                detections = np.vstack((detections, currentArray))
-
-    resultsTracker = tracker.update(detections[:, :5])
-
-    # Draw the counting area
-    cv2.polylines(img, [np.array(counting_area, np.int32)], isClosed=True, color=(0, 255, 0), thickness=2)
-    # Draw the line crossing limits
-    cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 0, 255), 5)
-
-    # Initialize counters for vehicles inside the area for the current frame
-    cars_in_area = 0
-    vans_in_area = 0
-    motors_in_area = 0
-    bus_in_area = 0
-    bicycles_in_area = 0
-
-    for result in resultsTracker:
-        x1, y1, x2, y2, id = map(int, result)
-        w, h = x2 - x1, y2 - y1
-        cvzone.cornerRect(img, (x1, y1, w, h), l=9, rt=2, colorR=(255, 0, 255))
-        cvzone.putTextRect(img, f'{int(id)}', (x1, y1),
-                   scale=0.4, thickness=1, offset=4)
-
-
-        cx, cy = x1 + w // 2, y1 + h // 2
-        cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
-
-        # Find the detection with the highest IoU to get the class
-        best_iou = 0
-        associated_cls = -1
-        for det in detections:
-            # det is [x1, y1, x2, y2, conf, cls]
-            iou = calculate_iou((x1, y1, x2, y2), det[:4])
-            if iou > best_iou:
-                best_iou = iou
-                associated_cls = int(det[5])
-
-        if associated_cls != -1:
-            currentClass = classNames[associated_cls]
-
-            # Area-based counting logic
-            if cv2.pointPolygonTest(np.array(counting_area, np.int32), (cx, cy), False) >= 0:
-                if currentClass == "car":
-                    cars_in_area += 1
-                elif currentClass == "bus":
-                    bus_in_area += 1
-                elif currentClass == "truck" or currentClass == "tuk-tuk":
-                    vans_in_area += 1
-                elif currentClass == "motorcycle":
-                    motors_in_area += 1
-                elif currentClass == "bicycle":
-                    bicycles_in_area += 1
-
-            # Line-crossing counting logic (cumulative)
-            if limits[0] < cx < limits[2] and limits[1] - 15 < cy < limits[1] + 15:
-                if currentClass == "car" and id not in totalCar_line:
-                    totalCar_line.append(id)
-                elif currentClass == "bus" and id not in totalBus_line:
-                    totalBus_line.append(id)
-                elif (currentClass == "truck" or currentClass == "tuk-tuk") and id not in totalVan_line:
-                    totalVan_line.append(id)
-                elif currentClass == "motorcycle" and id not in totalMotor_line:
-                    totalMotor_line.append(id)
-                elif currentClass == "bicycle" and id not in totalBicycle_line:
-                    totalBicycle_line.append(id)
-
-    # Display Area Counts (left side)
-    cv2.putText(img, f"Area Cars: {cars_in_area}", (50, 50), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-    cv2.putText(img, f"Area Vans: {vans_in_area}", (50, 100), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-    cv2.putText(img, f"Area Motors: {motors_in_area}", (50, 150), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-    cv2.putText(img, f"Area Bus: {bus_in_area}", (50, 200), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-
-    # Display Line Counts (right side)
-    cv2.putText(img, f"Line Cars: {len(totalCar_line)}", (500, 50), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-    cv2.putText(img, f"Line Vans: {len(totalVan_line)}", (500, 100), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-    cv2.putText(img, f"Line Motors: {len(totalMotor_line)}", (500, 150), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-    cv2.putText(img, f"Line Bus: {len(totalBus_line)}", (500, 200), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-    cv2.putText(img, f"Line Bicycles: {len(totalBicycle_line)}", (500, 250), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
-
-
-    cv2.imshow("Image", img)
-
-    key = cv2.waitKey(1) & 0xFF
-
-    if key == ord('q'):
-        break
-    elif key == ord('f'):
-        freeze_frame = not freeze_frame
\ No newline at end of file
+            cvzone.cornerRect(img, (x1, y1, w, h), l=9, rt=2, colorR=(255, 0, 255))
+            cvzone.putTextRect(img, f'{int(id)}', (x1, y1),
+                       scale=0.4, thickness=1, offset=4)
+
+            cx, cy = x1 + w // 2, y1 + h // 2
+            cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
+
+            if hit:
+                totals_line[kind].add(id)
+
+        # Display Area Counts (left side)
+        cv2.putText(img, f"Area Cars: {cars_in_area}", (50, 50), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        cv2.putText(img, f"Area Vans: {vans_in_area}", (50, 100), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        cv2.putText(img, f"Area Motors: {motors_in_area}", (50, 150), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        cv2.putText(img, f"Area Bus: {bus_in_area}", (50, 200), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+
+        # Display Line Counts (right side)
+        cv2.putText(img, f"Line Cars: {len(totalCar_line)}", (500, 50), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        cv2.putText(img, f"Line Vans: {len(totalVan_line)}", (500, 100), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        cv2.putText(img, f"Line Motors: {len(totalMotor_line)}", (500, 150), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        cv2.putText(img, f"Line Bus: {len(totalBus_line)}", (500, 200), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        cv2.putText(img, f"Line Bicycles: {len(totalBicycle_line)}", (500, 250), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+
+        cv2.imshow("Image", img)
+
+        key = cv2.waitKey(1) & 0xFF
+
+        if key == ord('f'):
+            # Hold the current frame until 'f' is pressed again
+            key = 0
+            while key not in (ord('f'), ord('q')):
+                key = cv2.waitKey(0) & 0xFF
+        if key == ord('q'):
+            running = False
+            break
@@ -106,7 +106,7 @@ while True:
     cv2.line(img, (limits[0], limits[1]), (limits[2], limits[3]), (0, 0, 255), 5)
 
     for result in resultsTracker:
-        x1, y1, x2, y2, id = map(int, result)
+        x1, y1, x2, y2, id = map(int, result[:5])
         w, h = x2 - x1, y2 - y1
         cvzone.cornerRect(img, (x1, y1, w, h), l=9, rt=2, colorR=(255, 0, 255))
         cvzone.putTextRect(img, f' {int(id)}', (max(0, x1), max(35, y1)), scale=2, thickness=2, offset=10)
@@ -0,0 +1,39 @@
+# Export Version1.pt to a TensorRT engine (run once per machine, engines are GPU specific)
+# pip install ultralytics tensorrt
+#
+#   python vehicle_counting_integrated/scripts/export_tensorrt.py
+#
+# The counting scripts pick up Version1.engine automatically when it sits next to Version1.pt.
+
+from ultralytics import YOLO
+import argparse
+import os
+import torch
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+
+# The counting scripts infer on the mask's bounding box, 430x486 (w x h) for Masks/project.png at 960x540.
+# (h, w) = (480, 448) letterboxes that portrait crop at ~0.99 scale with a few columns of padding.
+# Must match the imgsz the counting scripts pass to the model.
+IMGSZ = (480, 448)
+# Largest batch the engine accepts; dynamic=True still allows smaller batches
+BATCH_SIZE = 8
+
+parser = argparse.ArgumentParser(description="Export YOLO weights to a TensorRT engine")
+parser.add_argument("--model", default=os.path.join(PROJECT_ROOT, "Version1.pt"), help="Path to the .pt weights")
+args = parser.parse_args()
+
+if not torch.cuda.is_available():
+    raise SystemExit("TensorRT export needs a CUDA GPU")
+
+model = YOLO(args.model)
+engine_path = model.export(
+    format="engine",
+    half=True,
+    imgsz=IMGSZ,
+    batch=BATCH_SIZE,
+    dynamic=True,
+    device=0,
+)
+print(f"Engine saved to: {engine_path}")
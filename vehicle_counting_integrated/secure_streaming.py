@@ -339,6 +339,9 @@ class SQLiteDatabaseManager:
                 conn = sqlite3.connect(self.db_path)
                 cursor = conn.cursor()
                 
+                # WAL lets readers (e.g. the simulation exporter) query while counts are being written
+                cursor.execute('PRAGMA journal_mode=WAL')
+                
                 # Create tables if they don't exist
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS vehicle_counts (
@@ -96,9 +96,10 @@ class KalmanBoxTracker(object):
   This class represents the internal state of individual tracked objects observed as bbox.
   """
   count = 0
-  def __init__(self,bbox):
+  def __init__(self,bbox,det_idx=-1):
     """
     Initialises a tracker using initial bounding box.
+    det_idx is the row of bbox in the detections passed to Sort.update.
     """
     #define constant velocity model
     self.kf = KalmanFilter(dim_x=7, dim_z=4) 
@@ -119,12 +120,14 @@ class KalmanBoxTracker(object):
     self.hits = 0
     self.hit_streak = 0
     self.age = 0
+    self.det_idx = det_idx
 
-  def update(self,bbox):
+  def update(self,bbox,det_idx=-1):
     """
     Updates the state vector with observed bbox.
     """
     self.time_since_update = 0
+    self.det_idx = det_idx
     self.history = []
     self.hits += 1
     self.hit_streak += 1
@@ -138,12 +141,24 @@ class KalmanBoxTracker(object):
       self.kf.x[6] *= 0.0
     self.kf.predict()
     self.age += 1
+    self.det_idx = -1
     if(self.time_since_update>0):
       self.hit_streak = 0
     self.time_since_update += 1
     self.history.append(convert_x_to_bbox(self.kf.x))
     return self.history[-1]
 
+  def coast(self):
+    """
+    Advances the state vector for a frame the detector skipped.
+    Unlike predict, this is not counted as a missed detection.
+    """
+    if((self.kf.x[6]+self.kf.x[2])<=0):
+      self.kf.x[6] *= 0.0
+    self.kf.predict()
+    self.det_idx = -1
+    return convert_x_to_bbox(self.kf.x)
+
   def get_state(self):
     """
     Returns the current bounding box estimate.
@@ -212,7 +227,8 @@ class Sort(object):
     Params:
       dets - a numpy array of detections in the format [[x1,y1,x2,y2,score],[x1,y1,x2,y2,score],...]
     Requires: this method must be called once for each frame even with empty detections (use np.empty((0, 5)) for frames without detections).
-    Returns the a similar array, where the last column is the object ID.
+    Returns an array in the format [[x1,y1,x2,y2,id,det_idx],...] where det_idx is the row in dets
+    that updated the track this frame, or -1 if it was not matched.
 
     NOTE: The number of objects returned may differ from the number of detections provided.
     """
@@ -233,24 +249,40 @@ class Sort(object):
 
     # update matched trackers with assigned detections
     for m in matched:
-      self.trackers[m[1]].update(dets[m[0], :])
+      self.trackers[m[1]].update(dets[m[0], :], m[0])
 
     # create and initialise new trackers for unmatched detections
     for i in unmatched_dets:
-        trk = KalmanBoxTracker(dets[i,:])
+        trk = KalmanBoxTracker(dets[i,:], i)
         self.trackers.append(trk)
     i = len(self.trackers)
     for trk in reversed(self.trackers):
         d = trk.get_state()[0]
         if (trk.time_since_update < 1) and (trk.hit_streak >= self.min_hits or self.frame_count <= self.min_hits):
-          ret.append(np.concatenate((d,[trk.id+1])).reshape(1,-1)) # +1 as MOT benchmark requires positive
+          ret.append(np.concatenate((d,[trk.id+1,trk.det_idx])).reshape(1,-1)) # +1 as MOT benchmark requires positive
         i -= 1
         # remove dead tracklet
         if(trk.time_since_update > self.max_age):
           self.trackers.pop(i)
     if(len(ret)>0):
       return np.concatenate(ret)
-    return np.empty((0,5))
+    return np.empty((0,6))
+
+  def predict(self):
+    """
+    Use instead of update on frames where detection was skipped (e.g. running the detector every k frames).
+    Moves every track along its constant velocity model without ageing or breaking its hit streak.
+    Returns the tracks update would have reported last frame at their new positions, in the same
+    [[x1,y1,x2,y2,id,det_idx],...] format with det_idx always -1.
+    """
+    ret = []
+    for trk in self.trackers:
+      d = trk.coast()[0]
+      if (trk.time_since_update < 1) and (trk.hit_streak >= self.min_hits or self.frame_count <= self.min_hits) and not np.any(np.isnan(d)):
+        ret.append(np.concatenate((d,[trk.id+1,-1])).reshape(1,-1))
+    if(len(ret)>0):
+      return np.concatenate(ret)
+    return np.empty((0,6))
 
 def parse_args():
     """Parse input arguments."""